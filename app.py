@@ -1,22 +1,28 @@
 import os
+import re
 import uuid
-import subprocess
+import secrets
+import socket
 import threading
-import json
+import subprocess
+import orjson
 import shutil
-import glob
 import time
 import asyncio
+import httpx
+import http.cookiejar
 from datetime import datetime
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple, Set
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+from watchfiles import awatch, Change
 
 from redis_client import get_redis, close_redis
-from job_store import RedisJobStore
+from job_store import RedisJobStore, ApiKeyUnreadable, _get_api_key_cipher
 from models import (
     JobData, JobStatus, CaptionSettings, CaptionStyleEnum,
     JobResult, ClipResult, ProcessResponseV2, JobStatusResponse, JobResultResponse
@@ -38,39 +44,134 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", "5"))
 MAX_FILE_SIZE_MB = 500  # 500 MB limit
 JOB_RETENTION_SECONDS = 3600  # 1 hour retention
+LOG_FLUSH_INTERVAL = 0.05  # seconds of subprocess output coalesced per Redis write
+LOG_BATCH_LINES = 50  # a batch is written early once this many lines are waiting
+LOG_LINE_LIMIT = 1024 * 1024  # tqdm bars redraw with \r, so one "line" can get long
+# Identifies this process's claimed jobs in Redis; set it to keep the same ID across restarts
+WORKER_ID = os.environ.get("WORKER_ID") or f"{socket.gethostname()}:{os.getpid()}"
+WORKER_HEARTBEAT_SECONDS = 30
+MAX_SOCIAL_UPLOADS = int(os.environ.get("MAX_SOCIAL_UPLOADS", "4"))
+# Threads for ffmpeg-heavy edit/clean/subtitle work, kept apart from the default executor
+MEDIA_WORKERS = int(os.environ.get("MEDIA_WORKERS", "2"))
+MAX_BATCH_JOBS = 100  # URLs accepted per /api/v2/process/batch call
+# Comma-separated allowed origins; unset means any origin, without credentials
+CORS_ORIGINS = [o.strip() for o in os.environ.get("OPENSHORTS_CORS_ORIGINS", "").split(",") if o.strip()]
+# Subprocess command prefix and environment, built once instead of per job
+_BASE_CMD = ("python", "-u", "main.py")
+_BASE_ENV = dict(os.environ)
+
+
+class AdmissionController:
+    """Limits concurrently running jobs. Unlike a Semaphore, the limit can change at runtime."""
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._active = 0
+        self._cond = asyncio.Condition()
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self._limit)
+            self._active += 1
+
+    async def release(self):
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify(1)
+
+    async def set_limit(self, limit: int):
+        async with self._cond:
+            self._limit = limit
+            # Raising the limit may admit several waiting jobs at once
+            self._cond.notify_all()
+
 
 # Application State
-# Semaphore to limit concurrency to MAX_CONCURRENT_JOBS
-concurrency_semaphore = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+# Admission control limits concurrency to MAX_CONCURRENT_JOBS (tunable via /api/admin/concurrency)
+admission = AdmissionController(MAX_CONCURRENT_JOBS)
+# Jobs running in this process; holding the tasks keeps them from being garbage collected
+running_jobs: Set[asyncio.Task] = set()
+# Limits simultaneous clip uploads to Upload-Post
+social_upload_slots = asyncio.Semaphore(MAX_SOCIAL_UPLOADS)
 
-# V2 API State (Redis-backed)
-job_queue_v2 = asyncio.Queue()
-# Store API keys in memory (not in Redis for security)
-job_api_keys: Dict[str, str] = {}
+# V2 API State (Redis-backed; the job queue lives in Redis too)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Queued jobs' API keys must be readable by every worker and after a restart
+    if os.environ.get("REDIS_URL") and not os.environ.get("API_KEY_SECRET"):
+        raise RuntimeError("API_KEY_SECRET must be set when REDIS_URL is configured")
+    try:
+        _get_api_key_cipher()
+    except ValueError:
+        raise RuntimeError("API_KEY_SECRET is not a valid Fernet key (32 url-safe base64-encoded bytes)") from None
+
     # Start v2 worker if Redis available
+    app.state.media_pool = ThreadPoolExecutor(max_workers=MEDIA_WORKERS, thread_name_prefix="media")
+
+    # One HTTP client for outbound API calls, so connections are reused.
+    # It is shared between users, so its cookie jar accepts no cookies.
+    app.state.http = httpx.AsyncClient(
+        timeout=30.0, limits=httpx.Limits(max_keepalive_connections=32),
+        cookies=http.cookiejar.CookieJar(policy=http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    )
+
+    # Connection and store are shared by every request and the worker
     redis = await get_redis()
-    v2_worker_task = None
+    app.state.redis = redis
+    app.state.store = RedisJobStore(redis) if redis else None
+    background_tasks = []
     if redis:
-        v2_worker_task = asyncio.create_task(process_queue_v2())
+        store = app.state.store
+        # Jobs this worker claimed before a restart go back on the queue
+        requeued = await store.requeue_worker_jobs(WORKER_ID)
+        if requeued:
+            print(f"v2 Requeued {requeued} unfinished job(s) for worker {WORKER_ID}")
+        # Register as alive before claiming anything, so other workers don't
+        # requeue a job this one has just claimed
+        await store.heartbeat(WORKER_ID, WORKER_HEARTBEAT_SECONDS * 3)
+        background_tasks = [
+            asyncio.create_task(process_queue_v2(store)),
+            asyncio.create_task(worker_heartbeat_v2(store)),
+        ]
         print("✅ Redis connected, V2 API enabled")
     else:
         print("⚠️ No REDIS_URL configured, V2 API disabled")
 
     yield
 
-    # Cleanup
+    # Cleanup: stop claiming new jobs before the connection goes away.
+    # Jobs still running stay in this worker's processing list and are
+    # requeued on restart.
+    for task in background_tasks:
+        task.cancel()
+    # fakeredis can swallow a cancellation that lands mid-command, so the
+    # loops are only given a few seconds to exit
+    if background_tasks:
+        await asyncio.wait(background_tasks, timeout=5)
+    app.state.store = None
     await close_redis()
+    await app.state.http.aclose()
+    app.state.media_pool.shutdown(wait=False, cancel_futures=True)
 
 app = FastAPI(lifespan=lifespan)
+app.state.redis = None
+app.state.store = None
 
 # Enable CORS for frontend
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
+    allow_origins=CORS_ORIGINS or ["*"],
+    # Credentials only with an explicit allowlist, never with the wildcard
+    allow_credentials=bool(CORS_ORIGINS),
     allow_methods=["*"],
     allow_headers=["*"],
 )
@@ -78,9 +179,24 @@ app.add_middleware(
 # Mount static files for serving videos
 app.mount("/videos", StaticFiles(directory=OUTPUT_DIR), name="videos")
 
+def clip_file_path(job_id: str, clip: ClipResult, input_filename: Optional[str] = None) -> str:
+    """Local file behind a clip's /videos URL, or input_filename in the same job dir.
+
+    Only the basename of input_filename is used, so it can't point outside the job dir.
+    """
+    return os.path.join(OUTPUT_DIR, job_id, os.path.basename(input_filename or clip.video_url))
+
+
 class ProcessRequest(BaseModel):
     url: str
 
+class BatchProcessRequest(BaseModel):
+    urls: List[str]
+    include_captions: bool = True
+    caption_style: str = "none"
+    caption_color: Optional[str] = None
+    caption_outline_color: Optional[str] = None
+
 class EditRequest(BaseModel):
     job_id: str
     clip_index: int
@@ -102,37 +218,61 @@ class SubtitleRequest(BaseModel):
 
 # ============= V2 API (Redis-backed) =============
 
-async def process_queue_v2():
+async def process_queue_v2(store: RedisJobStore):
     """Background worker for v2 jobs with Redis persistence."""
-    print(f"v2 Job Queue Worker started with {MAX_CONCURRENT_JOBS} concurrent slots.")
+    print(f"v2 Job Queue Worker {WORKER_ID} started with {admission.limit} concurrent slots.")
     while True:
         try:
-            job_id = await job_queue_v2.get()
-            await concurrency_semaphore.acquire()
-            print(f"v2 Acquired slot for job: {job_id}")
-            asyncio.create_task(run_job_v2_wrapper(job_id))
+            # Take a slot before claiming, so queued jobs stay available to other workers
+            await admission.acquire()
+            job_id = None
+            try:
+                job_id = await store.claim_job(WORKER_ID)
+            finally:
+                if not job_id:
+                    await admission.release()
+
+            if job_id:
+                print(f"v2 Acquired slot for job: {job_id}")
+                task = asyncio.create_task(run_job_v2_wrapper(job_id, store))
+                running_jobs.add(task)
+                task.add_done_callback(running_jobs.discard)
+            else:
+                # The in-memory store doesn't block on an empty queue
+                await asyncio.sleep(0.5)
         except Exception as e:
             print(f"v2 Queue dispatch error: {e}")
             await asyncio.sleep(1)
 
 
-async def run_job_v2_wrapper(job_id: str):
+async def worker_heartbeat_v2(store: RedisJobStore):
+    """Keep this worker's lease alive and requeue jobs claimed by dead workers."""
+    while True:
+        try:
+            await store.heartbeat(WORKER_ID, WORKER_HEARTBEAT_SECONDS * 3)
+            requeued = await store.requeue_orphaned_jobs()
+            if requeued:
+                print(f"v2 Requeued {requeued} job(s) from dead workers")
+        except Exception as e:
+            print(f"v2 Heartbeat error: {e}")
+        await asyncio.sleep(WORKER_HEARTBEAT_SECONDS)
+
+
+async def run_job_v2_wrapper(job_id: str, store: RedisJobStore):
     """Wrapper for v2 job execution."""
     try:
-        redis = await get_redis()
-        if not redis:
-            return
-
-        store = RedisJobStore(redis)
-        job = await store.get_job(job_id)
+        job = await store.get_job(job_id, with_logs=False)
 
         if job:
             await run_job_v2(job_id, job, store)
     except Exception as e:
         print(f"v2 Job wrapper error {job_id}: {e}")
     finally:
-        concurrency_semaphore.release()
-        job_queue_v2.task_done()
+        try:
+            await store.ack_job(WORKER_ID, job_id)
+        except Exception as e:
+            print(f"v2 Failed to ack job {job_id}: {e}")
+        await admission.release()
         print(f"v2 Released slot for job: {job_id}")
 
 
@@ -152,99 +292,259 @@ def parse_progress(log_line: str) -> Optional[Tuple[int, str]]:
     return None
 
 
-def enqueue_output_v2(out, job_id: str, store: RedisJobStore, loop):
-    """Reads output from subprocess and updates Redis."""
+async def read_output_v2(
+    stream: asyncio.StreamReader, job_id: str, log_queue: asyncio.Queue, batch_full: asyncio.Event
+):
+    """Reads output from subprocess and hands each line to the log flusher."""
     try:
-        for line in iter(out.readline, b''):
-            decoded_line = line.decode('utf-8').strip()
+        while True:
+            try:
+                line = await stream.readline()
+            except ValueError:
+                # Over LOG_LINE_LIMIT: the buffered head is dropped, the tail comes next
+                continue
+            if not line:
+                break
+            decoded_line = line.decode('utf-8', errors='replace').strip()
             if decoded_line:
                 print(f"v2 [Job Output] {decoded_line}")
-                # Schedule async Redis update
-                asyncio.run_coroutine_threadsafe(
-                    store.append_log(job_id, decoded_line),
-                    loop
-                )
-                # Parse and update progress
-                progress = parse_progress(decoded_line)
-                if progress:
-                    asyncio.run_coroutine_threadsafe(
-                        store.update_progress(job_id, progress[0], progress[1]),
-                        loop
-                    )
+                log_queue.put_nowait((decoded_line, parse_progress(decoded_line)))
+                if log_queue.qsize() >= LOG_BATCH_LINES:
+                    batch_full.set()
     except Exception as e:
         print(f"v2 Error reading output for job {job_id}: {e}")
     finally:
-        out.close()
+        # Sentinel: tells the flusher no more output is coming
+        log_queue.put_nowait(None)
 
 
-async def check_partial_results_v2(job_id: str, output_dir: str, store: RedisJobStore):
-    """Check for partial results during processing."""
-    json_files = glob.glob(os.path.join(output_dir, "*_metadata.json"))
-    if not json_files:
-        return
+async def flush_log_batches(
+    job_id: str, store: RedisJobStore, log_queue: asyncio.Queue, batch_full: asyncio.Event
+):
+    """Coalesce bursts of log lines and write each burst to Redis in one pipeline.
+
+    A batch goes out LOG_FLUSH_INTERVAL after its first line, or as soon as
+    LOG_BATCH_LINES lines are waiting.
+    """
+    finished = False
+    while not finished:
+        items = [await log_queue.get()]
+        if items[0] is not None and not batch_full.is_set():
+            try:
+                await asyncio.wait_for(batch_full.wait(), LOG_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+        while len(items) < LOG_BATCH_LINES and not log_queue.empty():
+            items.append(log_queue.get_nowait())
+        if log_queue.qsize() < LOG_BATCH_LINES:
+            batch_full.clear()
+
+        lines = []
+        progress = None
+        for item in items:
+            if item is None:
+                finished = True
+                continue
+            line, line_progress = item
+            lines.append(line)
+            if line_progress:
+                progress = line_progress
+
+        if lines:
+            try:
+                await store.append_logs(job_id, lines, progress)
+            except Exception as e:
+                print(f"v2 Error flushing logs for job {job_id}: {e}")
+
+
+# Redis stream entry ID, as returned in last_log_id
+LOG_ID_RE = re.compile(r"\d+-\d+")
+
+# Files main.py writes that are worth re-checking partial results for
+PARTIAL_RESULT_RE = re.compile(r"(_metadata\.json|_clip_\d+\.mp4)$")
+
+
+def is_partial_result_file(change: Change, path: str) -> bool:
+    """watchfiles filter: only finished metadata and clip files (not temp_ cuts)."""
+    if change == Change.deleted:
+        return False
+    name = os.path.basename(path)
+    return not name.startswith("temp_") and PARTIAL_RESULT_RE.search(name) is not None
+
+
+class JobState:
+    """Scan state for one running v2 job, shared by partial checks and finalize."""
+
+    def __init__(self):
+        # (path, st_mtime_ns, st_size) of the last metadata parse
+        self.meta_key: Optional[Tuple[str, int, int]] = None
+        self.meta: Optional[dict] = None
+        # Metadata stat and non-empty output files seen by the last partial scan
+        self.scan_key: Optional[Tuple[Tuple[int, int], frozenset]] = None
+        # Clip indices already published to Redis
+        self.ready_indices: set = set()
+        self.last_result: Optional[JobResult] = None
+
+    def load_metadata(self, path: str, st: os.stat_result) -> dict:
+        """Parse the metadata JSON, reusing the last parse while the file is unchanged."""
+        key = (path, st.st_mtime_ns, st.st_size)
+        if self.meta is None or self.meta_key != key:
+            with open(path, 'rb') as f:
+                self.meta = orjson.loads(f.read())
+            self.meta_key = key
+        return self.meta
+
+
+async def watch_partial_results_v2(
+    job_id: str, output_dir: str, store: RedisJobStore, state: JobState,
+    stop_event: asyncio.Event
+):
+    """Re-check partial results whenever main.py lands a metadata or clip file."""
+    try:
+        async for _ in awatch(output_dir, watch_filter=is_partial_result_file, stop_event=stop_event):
+            await check_partial_results_v2(job_id, output_dir, store, state)
+    except Exception as e:
+        print(f"v2 File watcher error for job {job_id}: {e}")
+
+
+def scan_output_dir(output_dir: str) -> Tuple[Optional[str], Dict[str, os.stat_result]]:
+    """One scandir pass over a job dir.
+
+    Returns the metadata filename (if any) and {filename: stat} for the
+    metadata/clip files, using the DirEntry instead of per-file stat calls.
+    """
+    metadata_name = None
+    stats: Dict[str, os.stat_result] = {}
+    with os.scandir(output_dir) as it:
+        for entry in it:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            if not PARTIAL_RESULT_RE.search(entry.name):
+                continue
+            if metadata_name is None and entry.name.endswith("_metadata.json"):
+                metadata_name = entry.name
+            stats[entry.name] = entry.stat(follow_symlinks=False)
+    return metadata_name, stats
+
+
+def build_clip_result(video_url: str, clip: dict) -> ClipResult:
+    return ClipResult(
+        video_url=video_url,
+        title=clip.get('video_title_for_youtube_short'),
+        description_tiktok=clip.get('video_description_for_tiktok'),
+        description_instagram=clip.get('video_description_for_instagram'),
+        description_youtube=clip.get('video_title_for_youtube_short')
+    )
+
 
+def _scan_partial(
+    job_id: str, output_dir: str, state: JobState
+) -> Optional[Tuple[set, List[ClipResult]]]:
+    """Clips whose files have landed so far, as (indices, results).
+
+    Returns None when nothing that affects readiness changed since the last
+    scan, e.g. while a clip that is already non-empty keeps growing.
+    """
+    metadata_name, stats = scan_output_dir(output_dir)
+    if not metadata_name or stats[metadata_name].st_size == 0:
+        return set(), []
+
+    meta_stat = stats[metadata_name]
+    scan_key = (
+        (meta_stat.st_mtime_ns, meta_stat.st_size),
+        frozenset(name for name, st in stats.items() if st.st_size > 0),
+    )
+    if scan_key == state.scan_key:
+        return None
+
+    metadata_path = os.path.join(output_dir, metadata_name)
+    data = state.load_metadata(metadata_path, stats[metadata_name])
+
+    clip_prefix = metadata_name.replace('_metadata.json', '_clip_')
+    url_prefix = f"/videos/{job_id}/{clip_prefix}"
+    clips = data.get('shorts', [])
+    ready_indices = set()
+    ready_clips = []
+
+    for i, clip in enumerate(clips):
+        clip_stat = stats.get(f"{clip_prefix}{i+1}.mp4")
+        if clip_stat and clip_stat.st_size > 0:
+            ready_indices.add(i)
+            ready_clips.append(build_clip_result(f"{url_prefix}{i+1}.mp4", clip))
+
+    # Only remembered once the metadata parsed, so a half-written file is retried
+    state.scan_key = scan_key
+    return ready_indices, ready_clips
+
+
+def _scan_final(job_id: str, output_dir: str, state: JobState) -> Optional[JobResult]:
+    """The complete result of a finished job, or None if no metadata was written."""
+    metadata_name, stats = scan_output_dir(output_dir)
+    if not metadata_name:
+        return None
+
+    # Usually already parsed by the last partial check
+    metadata_path = os.path.join(output_dir, metadata_name)
+    data = state.load_metadata(metadata_path, stats[metadata_name])
+
+    url_prefix = f"/videos/{job_id}/{metadata_name.replace('_metadata.json', '_clip_')}"
+    result_clips = [
+        build_clip_result(f"{url_prefix}{i+1}.mp4", clip)
+        for i, clip in enumerate(data.get('shorts', []))
+    ]
+
+    # Store transcript for editor/subtitle features
+    return JobResult(clips=result_clips, transcript=data.get('transcript'))
+
+
+async def check_partial_results_v2(
+    job_id: str, output_dir: str, store: RedisJobStore, state: JobState
+):
+    """Check for partial results during processing."""
     try:
-        target_json = json_files[0]
-        if os.path.getsize(target_json) == 0:
+        # Directory scan and JSON parse run off the event loop
+        scanned = await asyncio.to_thread(_scan_partial, job_id, output_dir, state)
+        if scanned is None:
             return
-
-        with open(target_json, 'r') as f:
-            data = json.load(f)
-
-        base_name = os.path.basename(target_json).replace('_metadata.json', '')
-        clips = data.get('shorts', [])
-        ready_clips = []
-
-        for i, clip in enumerate(clips):
-            clip_filename = f"{base_name}_clip_{i+1}.mp4"
-            clip_path = os.path.join(output_dir, clip_filename)
-            if os.path.exists(clip_path) and os.path.getsize(clip_path) > 0:
-                ready_clips.append(ClipResult(
-                    video_url=f"/videos/{job_id}/{clip_filename}",
-                    title=clip.get('video_title_for_youtube_short'),
-                    description_tiktok=clip.get('video_description_for_tiktok'),
-                    description_instagram=clip.get('video_description_for_instagram'),
-                    description_youtube=clip.get('video_title_for_youtube_short')
-                ))
-
-        if ready_clips:
-            await store.set_result(job_id, JobResult(clips=ready_clips))
+        ready_indices, ready_clips = scanned
+
+        # Only write to Redis when a new clip has landed
+        if ready_clips and ready_indices != state.ready_indices:
+            result = JobResult(clips=ready_clips)
+            await store.set_result(job_id, result)
+            state.ready_indices = ready_indices
+            state.last_result = result
     except Exception:
         pass
 
 
-async def finalize_job_v2(job_id: str, output_dir: str, store: RedisJobStore):
+async def finalize_job_v2(
+    job_id: str, output_dir: str, store: RedisJobStore, state: JobState
+):
     """Finalize completed job."""
-    json_files = glob.glob(os.path.join(output_dir, "*_metadata.json"))
-
-    if json_files:
-        with open(json_files[0], 'r') as f:
-            data = json.load(f)
-
-        base_name = os.path.basename(json_files[0]).replace('_metadata.json', '')
-        clips = data.get('shorts', [])
-        result_clips = []
-
-        for i, clip in enumerate(clips):
-            clip_filename = f"{base_name}_clip_{i+1}.mp4"
-            result_clips.append(ClipResult(
-                video_url=f"/videos/{job_id}/{clip_filename}",
-                title=clip.get('video_title_for_youtube_short'),
-                description_tiktok=clip.get('video_description_for_tiktok'),
-                description_instagram=clip.get('video_description_for_instagram'),
-                description_youtube=clip.get('video_title_for_youtube_short')
-            ))
-
-        # Store transcript for editor/subtitle features
-        transcript = data.get('transcript')
-        await store.set_result(job_id, JobResult(clips=result_clips, transcript=transcript))
-        await store.set_status(job_id, JobStatus.COMPLETED)
+    result = await asyncio.to_thread(_scan_final, job_id, output_dir, state)
+
+    if result:
+        state.last_result = result
+        # Result and status go out in a single write
+        await store.set_status(job_id, JobStatus.COMPLETED, result=result)
     else:
         await store.set_status(job_id, JobStatus.FAILED, "No metadata file generated")
 
 
 async def run_job_v2(job_id: str, job_data: JobData, store: RedisJobStore):
     """Execute v2 job with Redis progress tracking."""
+    # API key is stored encrypted alongside the job and removed when the job is acked.
+    # A key that can't be decrypted must not fall back to the server's own key.
+    try:
+        api_key = await store.get_api_key(job_id)
+    except ApiKeyUnreadable:
+        await store.set_status(
+            job_id, JobStatus.FAILED,
+            "Stored Gemini API key could not be decrypted; all workers must share the same API_KEY_SECRET"
+        )
+        return
+
     await store.set_status(job_id, JobStatus.PROCESSING)
     await store.append_log(job_id, "Job started by worker.")
 
@@ -252,7 +552,7 @@ async def run_job_v2(job_id: str, job_data: JobData, store: RedisJobStore):
     os.makedirs(job_output_dir, exist_ok=True)
 
     # Build command
-    cmd = ["python", "-u", "main.py", "-u", job_data.input_url, "-o", job_output_dir]
+    cmd = [*_BASE_CMD, "-u", job_data.input_url, "-o", job_output_dir]
 
     if job_data.caption_settings.include_captions:
         style = job_data.caption_settings.style
@@ -263,36 +563,40 @@ async def run_job_v2(job_id: str, job_data: JobData, store: RedisJobStore):
         if job_data.caption_settings.outline_color:
             cmd.extend(["--caption-outline-color", job_data.caption_settings.outline_color])
 
-    env = os.environ.copy()
-    # Get API key from in-memory store
-    if job_id in job_api_keys:
-        env["GEMINI_API_KEY"] = job_api_keys[job_id]
+    env = {**_BASE_ENV, "GEMINI_API_KEY": api_key} if api_key else _BASE_ENV
 
     try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
             env=env,
-            cwd=os.getcwd()
+            cwd=os.getcwd(),
+            limit=LOG_LINE_LIMIT
         )
 
-        # Log reader thread
-        loop = asyncio.get_event_loop()
-        t_log = threading.Thread(
-            target=enqueue_output_v2,
-            args=(process.stdout, job_id, store, loop),
-            daemon=True
+        # Output is read on the loop and fed to the batching flusher
+        log_queue: asyncio.Queue = asyncio.Queue()
+        batch_full = asyncio.Event()
+        log_reader = asyncio.create_task(read_output_v2(process.stdout, job_id, log_queue, batch_full))
+        log_flusher = asyncio.create_task(flush_log_batches(job_id, store, log_queue, batch_full))
+
+        # Wait for completion, publishing partial results as files land
+        state = JobState()
+        stop_watching = asyncio.Event()
+        watcher = asyncio.create_task(
+            watch_partial_results_v2(job_id, job_output_dir, store, state, stop_watching)
         )
-        t_log.start()
+        await process.wait()
+        stop_watching.set()
+        await watcher
 
-        # Wait for completion with incremental updates
-        while process.poll() is None:
-            await asyncio.sleep(2)
-            await check_partial_results_v2(job_id, job_output_dir, store)
+        # Make sure the tail of the output is in Redis before finalizing
+        await log_reader
+        await log_flusher
 
         if process.returncode == 0:
-            await finalize_job_v2(job_id, job_output_dir, store)
+            await finalize_job_v2(job_id, job_output_dir, store, state)
         else:
             await store.set_status(
                 job_id, JobStatus.FAILED,
@@ -301,38 +605,26 @@ async def run_job_v2(job_id: str, job_data: JobData, store: RedisJobStore):
 
     except Exception as e:
         await store.set_status(job_id, JobStatus.FAILED, str(e))
-    finally:
-        # Clean up API key from memory
-        if job_id in job_api_keys:
-            del job_api_keys[job_id]
 
 
-@app.post("/api/v2/process", response_model=ProcessResponseV2)
-async def process_v2(
-    request: Request,
-    url: str = Query(..., description="Video URL or YouTube link"),
-    include_captions: bool = Query(True, description="Include captions in output"),
-    caption_style: str = Query("none", description="Caption style"),
-    caption_color: Optional[str] = Query(None, description="Hex color for caption text"),
-    caption_outline_color: Optional[str] = Query(None, description="Hex color for caption outline")
-):
-    """Submit a video for processing (v2 with Redis persistence)."""
-    redis = await get_redis()
-    if not redis:
-        raise HTTPException(
-            status_code=503,
-            detail="v2 API requires Redis. Set REDIS_URL environment variable."
-        )
-
-    # Get API key from header, fall back to environment variable
+def require_gemini_key(request: Request) -> str:
+    """API key from the X-Gemini-Key header, falling back to the environment."""
     api_key = request.headers.get("X-Gemini-Key") or os.environ.get("GEMINI_API_KEY")
     if not api_key:
         raise HTTPException(
             status_code=400,
             detail="Missing Gemini API key. Provide X-Gemini-Key header or set GEMINI_API_KEY env var."
         )
+    return api_key
 
-    # Validate caption style
+
+def build_caption_settings(
+    include_captions: bool,
+    caption_style: str,
+    caption_color: Optional[str],
+    caption_outline_color: Optional[str]
+) -> CaptionSettings:
+    """Validate the caption options of a submission."""
     valid_styles = [e.value for e in CaptionStyleEnum]
     if caption_style not in valid_styles:
         raise HTTPException(
@@ -340,42 +632,96 @@ async def process_v2(
             detail=f"Invalid caption_style. Must be one of: {valid_styles}"
         )
 
-    job_id = str(uuid.uuid4())
-    store = RedisJobStore(redis)
+    return CaptionSettings(
+        include_captions=include_captions,
+        style=CaptionStyleEnum(caption_style),
+        color=caption_color,
+        outline_color=caption_outline_color
+    )
+
 
-    job = JobData(
+def new_job_v2(url: str, caption_settings: CaptionSettings) -> JobData:
+    job_id = str(uuid.uuid4())
+    return JobData(
         job_id=job_id,
         status=JobStatus.QUEUED,
         input_url=url,
-        caption_settings=CaptionSettings(
-            include_captions=include_captions,
-            style=CaptionStyleEnum(caption_style),
-            color=caption_color,
-            outline_color=caption_outline_color
-        ),
+        caption_settings=caption_settings,
         created_at=datetime.utcnow(),
         logs=[f"Job {job_id} queued."]
     )
 
-    await store.create_job(job)
 
-    # Store API key in memory (not in Redis for security)
-    job_api_keys[job_id] = api_key
+@app.post("/api/v2/process", response_model=ProcessResponseV2)
+async def process_v2(
+    request: Request,
+    url: str = Query(..., description="Video URL or YouTube link"),
+    include_captions: bool = Query(True, description="Include captions in output"),
+    caption_style: str = Query("none", description="Caption style"),
+    caption_color: Optional[str] = Query(None, description="Hex color for caption text"),
+    caption_outline_color: Optional[str] = Query(None, description="Hex color for caption outline")
+):
+    """Submit a video for processing (v2 with Redis persistence)."""
+    store = app.state.store
+    if not store:
+        raise HTTPException(
+            status_code=503,
+            detail="v2 API requires Redis. Set REDIS_URL environment variable."
+        )
+
+    api_key = require_gemini_key(request)
+    caption_settings = build_caption_settings(
+        include_captions, caption_style, caption_color, caption_outline_color
+    )
+    job = new_job_v2(url, caption_settings)
+
+    # Job, its encrypted API key and the queue entry are written in one round trip
+    await store.create_and_enqueue(job, api_key=api_key)
+
+    return ProcessResponseV2(job_id=job.job_id, status="queued")
+
 
-    await job_queue_v2.put(job_id)
+@app.post("/api/v2/process/batch", response_model=List[ProcessResponseV2])
+async def process_batch_v2(request: Request, req: BatchProcessRequest):
+    """Submit several videos with the same caption settings in one call."""
+    store = app.state.store
+    if not store:
+        raise HTTPException(
+            status_code=503,
+            detail="v2 API requires Redis. Set REDIS_URL environment variable."
+        )
 
-    return ProcessResponseV2(job_id=job_id, status="queued")
+    if not req.urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(req.urls) > MAX_BATCH_JOBS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_JOBS} URLs per batch")
+
+    api_key = require_gemini_key(request)
+    caption_settings = build_caption_settings(
+        req.include_captions, req.caption_style, req.caption_color, req.caption_outline_color
+    )
+    jobs = [new_job_v2(url, caption_settings) for url in req.urls]
+
+    # All jobs are written and queued, in submission order, in one round trip
+    await store.create_and_enqueue_many(jobs, api_key=api_key)
+
+    return [ProcessResponseV2(job_id=job.job_id, status="queued") for job in jobs]
 
 
 @app.get("/api/v2/jobs/{job_id}", response_model=JobStatusResponse)
-async def get_job_status_v2(job_id: str):
+async def get_job_status_v2(
+    job_id: str,
+    since_id: Optional[str] = Query(None, description="Only return log lines after this last_log_id")
+):
     """Get job status and progress."""
-    redis = await get_redis()
-    if not redis:
+    store = app.state.store
+    if not store:
         raise HTTPException(status_code=503, detail="v2 API requires Redis")
 
-    store = RedisJobStore(redis)
-    job = await store.get_job(job_id)
+    if since_id and not LOG_ID_RE.fullmatch(since_id):
+        raise HTTPException(status_code=400, detail="Invalid since_id")
+
+    job, last_log_id = await store.get_job_with_logs_since(job_id, since_id)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -386,6 +732,7 @@ async def get_job_status_v2(job_id: str):
         progress_percentage=job.progress_percentage,
         progress_stage=job.progress_stage,
         logs=job.logs,
+        last_log_id=last_log_id,
         created_at=job.created_at.isoformat(),
         started_at=job.started_at.isoformat() if job.started_at else None,
         error=job.error
@@ -395,12 +742,11 @@ async def get_job_status_v2(job_id: str):
 @app.get("/api/v2/jobs/{job_id}/result", response_model=JobResultResponse)
 async def get_job_result_v2(job_id: str):
     """Get job result (completed videos and metadata)."""
-    redis = await get_redis()
-    if not redis:
+    store = app.state.store
+    if not store:
         raise HTTPException(status_code=503, detail="v2 API requires Redis")
 
-    store = RedisJobStore(redis)
-    job = await store.get_job(job_id)
+    job = await store.get_job(job_id, with_logs=False)
 
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
@@ -416,12 +762,11 @@ async def get_job_result_v2(job_id: str):
 @app.post("/api/v2/edit")
 async def edit_clip_v2(req: EditRequest):
     """Edit a clip by removing filler words and dead silence."""
-    redis = await get_redis()
-    if not redis:
+    store = app.state.store
+    if not store:
         raise HTTPException(status_code=503, detail="v2 API requires Redis")
 
-    store = RedisJobStore(redis)
-    job = await store.get_job(req.job_id)
+    job = await store.get_job(req.job_id, with_logs=False)
 
     if not job or not job.result or not job.result.clips:
         raise HTTPException(status_code=404, detail="Job not found or no clips available")
@@ -431,8 +776,7 @@ async def edit_clip_v2(req: EditRequest):
     except IndexError:
         raise HTTPException(status_code=404, detail=f"Clip index {req.clip_index} not found")
 
-    filename = clip.video_url.split('/')[-1]
-    input_path = os.path.join(OUTPUT_DIR, req.job_id, req.input_filename or filename)
+    input_path = clip_file_path(req.job_id, clip, req.input_filename)
 
     if not os.path.exists(input_path):
         raise HTTPException(status_code=404, detail="Video file not found")
@@ -441,8 +785,8 @@ async def edit_clip_v2(req: EditRequest):
         base, ext = os.path.splitext(input_path)
         output_path = f"{base}_edited{ext}"
 
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, lambda: cleaner.clean_clip(input_path, output_path))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(app.state.media_pool, lambda: cleaner.clean_clip(input_path, output_path))
 
         edited_filename = os.path.basename(output_path)
         new_url = f"/videos/{req.job_id}/{edited_filename}"
@@ -456,12 +800,11 @@ async def edit_clip_v2(req: EditRequest):
 @app.post("/api/v2/clean")
 async def clean_clip_v2(req: CleanRequest):
     """Remove filler words (umm, um, uh, etc.) and dead silence from a clip."""
-    redis = await get_redis()
-    if not redis:
+    store = app.state.store
+    if not store:
         raise HTTPException(status_code=503, detail="v2 API requires Redis")
 
-    store = RedisJobStore(redis)
-    job = await store.get_job(req.job_id)
+    job = await store.get_job(req.job_id, with_logs=False)
 
     if not job or not job.result or not job.result.clips:
         raise HTTPException(status_code=404, detail="Job not found or no clips available")
@@ -471,8 +814,7 @@ async def clean_clip_v2(req: CleanRequest):
     except IndexError:
         raise HTTPException(status_code=404, detail=f"Clip index {req.clip_index} not found")
 
-    filename = clip.video_url.split('/')[-1]
-    input_path = os.path.join(OUTPUT_DIR, req.job_id, filename)
+    input_path = clip_file_path(req.job_id, clip)
     if not os.path.exists(input_path):
         raise HTTPException(status_code=404, detail="Video file not found on disk")
 
@@ -480,9 +822,9 @@ async def clean_clip_v2(req: CleanRequest):
         base, ext = os.path.splitext(input_path)
         output_path = f"{base}_cleaned{ext}"
 
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         await loop.run_in_executor(
-            None,
+            app.state.media_pool,
             lambda: cleaner.clean_clip(input_path, output_path, req.max_silence_gap, req.silence_pad)
         )
 
@@ -497,12 +839,11 @@ async def clean_clip_v2(req: CleanRequest):
 @app.post("/api/v2/subtitle")
 async def add_subtitles_v2(req: SubtitleRequest):
     """Add word-level subtitles to a clip."""
-    redis = await get_redis()
-    if not redis:
+    store = app.state.store
+    if not store:
         raise HTTPException(status_code=503, detail="v2 API requires Redis")
 
-    store = RedisJobStore(redis)
-    job = await store.get_job(req.job_id)
+    job = await store.get_job(req.job_id, with_logs=False)
 
     if not job or not job.result or not job.result.clips:
         raise HTTPException(status_code=404, detail="Job not found or no clips available")
@@ -514,8 +855,7 @@ async def add_subtitles_v2(req: SubtitleRequest):
         raise HTTPException(status_code=404, detail=f"Clip index {req.clip_index} not found")
 
     # Get video file path
-    filename = clip.video_url.split('/')[-1]
-    input_path = os.path.join(OUTPUT_DIR, req.job_id, req.input_filename or filename)
+    input_path = clip_file_path(req.job_id, clip, req.input_filename)
 
     if not os.path.exists(input_path):
         raise HTTPException(status_code=404, detail="Video file not found")
@@ -526,9 +866,9 @@ async def add_subtitles_v2(req: SubtitleRequest):
 
     try:
         # Generate SRT and burn subtitles (blocking I/O)
-        loop = asyncio.get_event_loop()
+        loop = asyncio.get_running_loop()
         output_path = await loop.run_in_executor(
-            None,
+            app.state.media_pool,
             subtitles.add_subtitles_to_video,
             input_path,
             job.result.transcript,
@@ -546,6 +886,36 @@ async def add_subtitles_v2(req: SubtitleRequest):
         raise HTTPException(status_code=500, detail=f"Subtitle failed: {str(e)}")
 
 
+# ============= Admin =============
+
+def require_admin(admin_key: Optional[str]):
+    """Admin endpoints are disabled unless ADMIN_API_KEY is set."""
+    expected = os.environ.get("ADMIN_API_KEY")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin API disabled. Set ADMIN_API_KEY to enable it.")
+    if not admin_key or not secrets.compare_digest(admin_key, expected):
+        raise HTTPException(status_code=401, detail="Invalid admin key")
+
+
+@app.get("/api/admin/concurrency")
+async def get_concurrency(admin_key: Optional[str] = Header(None, alias="X-Admin-Key")):
+    """Current job concurrency limit and number of running jobs."""
+    require_admin(admin_key)
+    return {"limit": admission.limit, "active": admission.active}
+
+
+@app.post("/api/admin/concurrency")
+async def set_concurrency(
+    limit: int = Query(..., ge=1, description="Maximum number of jobs to run at once"),
+    admin_key: Optional[str] = Header(None, alias="X-Admin-Key")
+):
+    """Change the job concurrency limit without a restart."""
+    require_admin(admin_key)
+    await admission.set_limit(limit)
+    print(f"Concurrency limit set to {limit}")
+    return {"limit": admission.limit, "active": admission.active}
+
+
 # ============= Social Media Integration =============
 
 class SocialPostRequest(BaseModel):
@@ -560,17 +930,15 @@ class SocialPostRequest(BaseModel):
     instagram_description: Optional[str] = None
     youtube_description: Optional[str] = None
 
-import httpx
 
 @app.post("/api/social/post")
 async def post_to_socials(req: SocialPostRequest):
     # Get job from V2 Redis store
-    redis = await get_redis()
-    if not redis:
+    store = app.state.store
+    if not store:
         raise HTTPException(status_code=503, detail="Redis not available")
 
-    store = RedisJobStore(redis)
-    job_data = await store.get_job(req.job_id)
+    job_data = await store.get_job(req.job_id, with_logs=False)
 
     if not job_data or not job_data.result:
         raise HTTPException(status_code=404, detail="Job not found or not completed")
@@ -580,13 +948,8 @@ async def post_to_socials(req: SocialPostRequest):
 
     try:
         clip = job_data.result.clips[req.clip_index]
-        # Video URL is relative /videos/..., we need absolute file path
-        # clip.video_url is like "/videos/{job_id}/{filename}"
-        # We constructed it as: f"/videos/{job_id}/{clip_filename}"
-        # And file is at f"{OUTPUT_DIR}/{job_id}/{clip_filename}"
-
-        filename = clip.video_url.split('/')[-1]
-        file_path = os.path.join(OUTPUT_DIR, req.job_id, filename)
+        file_path = clip_file_path(req.job_id, clip)
+        filename = os.path.basename(file_path)
 
         if not os.path.exists(file_path):
              raise HTTPException(status_code=404, detail=f"Video file not found: {file_path}")
@@ -626,25 +989,27 @@ async def post_to_socials(req: SocialPostRequest):
              data_payload["privacyStatus"] = "public"
 
         # Send File
-        # httpx AsyncClient requires async file reading or bytes. 
-        # Since we have MAX_FILE_SIZE_MB, reading into memory is safe-ish.
-        with open(file_path, "rb") as f:
-            file_content = f.read()
-            
-        files = {
-            "video": (filename, file_content, "video/mp4")
-        }
+        # httpx streams the open file in chunks and sizes it with fstat, so the
+        # request carries a Content-Length instead of chunked encoding.
+        with open(file_path, "rb") as video:
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(video.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            files = {
+                "video": (filename, video, "video/mp4")
+            }
+
+            # Bound concurrent outbound uploads without blocking the event loop
+            async with social_upload_slots:
+                print(f"📡 Sending to Upload-Post for platforms: {req.platforms}")
+                response = await app.state.http.post(
+                    url, headers=headers, data=data_payload, files=files, timeout=120.0
+                )
 
-        # Switch to synchronous Client to avoid "sync request with AsyncClient" error with multipart/files
-        with httpx.Client(timeout=120.0) as client:
-            print(f"📡 Sending to Upload-Post for platforms: {req.platforms}")
-            response = client.post(url, headers=headers, data=data_payload, files=files)
-            
         if response.status_code not in [200, 201, 202]: # Added 201
              print(f"❌ Upload-Post Error: {response.text}")
              raise HTTPException(status_code=response.status_code, detail=f"Vendor API Error: {response.text}")
 
-        return response.json()
+        return orjson.loads(response.content)
 
     except Exception as e:
         print(f"❌ Social Post Exception: {e}")
@@ -660,48 +1025,48 @@ async def get_social_user(api_key: str = Header(..., alias="X-Upload-Post-Key"))
     print(f"🔍 Fetching User ID from: {url}")
     headers = {"Authorization": f"Apikey {api_key}"}
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        try:
-            resp = await client.get(url, headers=headers)
-            if resp.status_code != 200:
-                print(f"❌ Upload-Post User Fetch Error: {resp.text}")
-                raise HTTPException(status_code=resp.status_code, detail=f"Failed to fetch user: {resp.text}")
-            
-            data = resp.json()
-            print(f"🔍 Upload-Post User Response: {data}")
-            
-            user_id = None
-            # The structure is {'success': True, 'profiles': [{'username': '...'}, ...]}
-            profiles_list = []
-            if isinstance(data, dict):
-                 raw_profiles = data.get('profiles', [])
-                 if isinstance(raw_profiles, list):
-                     for p in raw_profiles:
-                         username = p.get('username')
-                         if username:
-                             # Determine connected platforms
-                             socials = p.get('social_accounts', {})
-                             connected = []
-                             # Check typical platforms
-                             for platform in ['tiktok', 'instagram', 'youtube']:
-                                 account_info = socials.get(platform)
-                                 # If it's a dict and typically has data, or just not empty string
-                                 if isinstance(account_info, dict):
-                                     connected.append(platform)
-                             
-                             profiles_list.append({
-                                 "username": username,
-                                 "connected": connected
-                             })
-            
-            if not profiles_list:
-                # Fallback if no profiles found
-                return {"profiles": [], "error": "No profiles found"}
-                
-            return {"profiles": profiles_list}
+    client = app.state.http
+    try:
+        resp = await client.get(url, headers=headers)
+        if resp.status_code != 200:
+            print(f"❌ Upload-Post User Fetch Error: {resp.text}")
+            raise HTTPException(status_code=resp.status_code, detail=f"Failed to fetch user: {resp.text}")
+        
+        data = orjson.loads(resp.content)
+        print(f"🔍 Upload-Post User Response: {data}")
+        
+        user_id = None
+        # The structure is {'success': True, 'profiles': [{'username': '...'}, ...]}
+        profiles_list = []
+        if isinstance(data, dict):
+             raw_profiles = data.get('profiles', [])
+             if isinstance(raw_profiles, list):
+                 for p in raw_profiles:
+                     username = p.get('username')
+                     if username:
+                         # Determine connected platforms
+                         socials = p.get('social_accounts', {})
+                         connected = []
+                         # Check typical platforms
+                         for platform in ['tiktok', 'instagram', 'youtube']:
+                             account_info = socials.get(platform)
+                             # If it's a dict and typically has data, or just not empty string
+                             if isinstance(account_info, dict):
+                                 connected.append(platform)
+                         
+                         profiles_list.append({
+                             "username": username,
+                             "connected": connected
+                         })
+        
+        if not profiles_list:
+            # Fallback if no profiles found
+            return {"profiles": [], "error": "No profiles found"}
             
-        except Exception as e:
-             raise HTTPException(status_code=500, detail=str(e))
+        return {"profiles": profiles_list}
+        
+    except Exception as e:
+         raise HTTPException(status_code=500, detail=str(e))
 
 
 # ---------------------------------------------------------------------------
@@ -717,7 +1082,7 @@ class TranscribeResponse(BaseModel):
     language: str
     duration_seconds: float
 
-def _download_video(url: str, output_dir: str) -> str:
+async def _download_video(url: str, output_dir: str) -> str:
     """Download video via yt-dlp (works for YouTube and direct URLs)."""
     import urllib.parse
     parsed = urllib.parse.urlparse(url)
@@ -725,14 +1090,21 @@ def _download_video(url: str, output_dir: str) -> str:
     is_youtube = any(h in hostname for h in ('youtube.com', 'youtu.be', 'youtube-nocookie.com'))
 
     if not is_youtube:
-        # Direct URL download
-        import urllib.request
+        # Direct URL download, streamed over the shared client's connection pool
         ext = os.path.splitext(parsed.path)[1] or '.mp4'
         out = os.path.join(output_dir, f"video{ext}")
-        urllib.request.urlretrieve(url, out)
+        async with app.state.http.stream("GET", url, follow_redirects=True) as response:
+            response.raise_for_status()
+            with open(out, "wb") as f:
+                async for chunk in response.aiter_bytes(chunk_size=1 << 20):
+                    f.write(chunk)
         return out
 
-    # YouTube download via yt-dlp
+    return await asyncio.to_thread(_download_youtube, url, output_dir)
+
+
+def _download_youtube(url: str, output_dir: str) -> str:
+    """Extract a YouTube video's audio with yt-dlp."""
     output_template = os.path.join(output_dir, "video.%(ext)s")
     cmd = [
         "yt-dlp", "-x", "--audio-format", "wav",
@@ -749,18 +1121,52 @@ def _download_video(url: str, output_dir: str) -> str:
     raise RuntimeError("yt-dlp produced no output file")
 
 
+WHISPER_BATCH_SIZE = int(os.environ.get("WHISPER_BATCH_SIZE", "16"))
+
+_whisper_model = None
+_whisper_lock = threading.Lock()
+
+
+def _get_whisper_model():
+    """Load the Faster-Whisper model on first use and keep it for later requests.
+
+    Returns a batched pipeline, which decodes VAD-split chunks of the audio
+    in parallel.
+    """
+    global _whisper_model
+
+    with _whisper_lock:
+        if _whisper_model is None:
+            import ctranslate2
+            from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+            if ctranslate2.get_cuda_device_count() > 0:
+                device, compute_type = "cuda", "float16"
+            else:
+                device, compute_type = "cpu", "int8"
+            model_name = os.environ.get("WHISPER_MODEL", "base")
+            print(f"🎙️ Loading Whisper model '{model_name}' on {device} ({compute_type})")
+            model = WhisperModel(model_name, device=device, compute_type=compute_type)
+            _whisper_model = BatchedInferencePipeline(model=model)
+
+    return _whisper_model
+
+
 def _transcribe(video_path: str) -> dict:
     """Transcribe a local audio/video file with Faster-Whisper."""
-    from faster_whisper import WhisperModel
-    model = WhisperModel("base", device="cpu", compute_type="int8")
-    segments, info = model.transcribe(video_path, word_timestamps=False)
-    parts = []
-    total_duration = 0.0
-    for seg in segments:
-        parts.append(seg.text.strip())
-        total_duration = seg.end
-    text = " ".join(parts)
-    return {"text": text, "language": info.language, "duration": total_duration}
+    pipeline = _get_whisper_model()
+    # VAD skips silence; greedy decoding without conditioning on earlier text
+    # is several times faster than the default beam search
+    segments, info = pipeline.transcribe(
+        video_path,
+        batch_size=WHISPER_BATCH_SIZE,
+        vad_filter=True,
+        beam_size=1,
+        condition_on_previous_text=False,
+        word_timestamps=False,
+    )
+    text = " ".join(seg.text.strip() for seg in segments)
+    return {"text": text, "language": info.language, "duration": info.duration}
 
 
 @app.post("/api/transcribe", response_model=TranscribeResponse)
@@ -770,7 +1176,7 @@ async def transcribe_url(req: TranscribeRequest):
 
     tmp_dir = tempfile.mkdtemp(prefix="transcribe_")
     try:
-        video_path = await asyncio.to_thread(_download_video, req.url, tmp_dir)
+        video_path = await _download_video(req.url, tmp_dir)
         if not video_path or not os.path.exists(video_path):
             raise HTTPException(status_code=400, detail="Failed to download video")
 
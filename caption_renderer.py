@@ -7,6 +7,9 @@ import cv2
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import os
+import bisect
+import functools
+import types
 
 # Caption style presets
 CAPTION_STYLES = {
@@ -89,6 +92,12 @@ CAPTION_STYLES = {
 }
 
 
+# Optional TrueType font for captions (e.g. one with CJK coverage); Hershey Duplex otherwise
+CAPTION_FONT_PATH = os.environ.get("CAPTION_FONT_PATH")
+# TrueType pixel size per unit of font_scale, close to the Hershey font's size
+TRUETYPE_PIXELS_PER_SCALE = 32
+
+
 def hex_to_bgr(hex_color):
     """Convert hex color string to BGR tuple for OpenCV."""
     if not hex_color:
@@ -114,11 +123,51 @@ def get_style_config(style_name, custom_color=None, custom_outline_color=None):
     return config
 
 
+@functools.lru_cache(maxsize=64)
+def _style_config_cached(style_name, custom_color=None, custom_outline_color=None):
+    """Read-only style configuration, resolved once per style and colour combination."""
+    return types.MappingProxyType(get_style_config(style_name, custom_color, custom_outline_color))
+
+
+def prepare_transcript_arrays(transcript_words):
+    """
+    Convert word dicts into parallel arrays ordered by start time.
+    Accepts both 'word'/'start'/'end' and 'w'/'s'/'e' keys.
+
+    Returns:
+        (starts, ends, texts) - float64 arrays and a list of word strings
+    """
+    words = transcript_words or []
+    starts = np.array([w.get('start', w.get('s', 0)) for w in words], dtype=np.float64)
+    ends = np.array([w.get('end', w.get('e', 0)) for w in words], dtype=np.float64)
+    texts = [w.get('word', w.get('w', '')) for w in words]
+
+    order = np.argsort(starts, kind='stable')
+    return starts[order], ends[order], [texts[i] for i in order]
+
+
 def get_active_caption_text(transcript_words, current_time, window_size=3.0):
     """
     Get the words that should be displayed at the current timestamp.
+    transcript_words is a list of word dicts, or the arrays returned by
+    prepare_transcript_arrays when the same transcript is queried repeatedly.
     Returns a list of word dicts with timing info.
     """
+    if isinstance(transcript_words, tuple):
+        starts, ends, texts = transcript_words
+        # Only words that have started can be visible
+        started = np.searchsorted(starts, current_time, side='right')
+        active = np.flatnonzero(current_time <= ends[:started] + window_size)
+        return [
+            {
+                'word': texts[i],
+                'start': float(starts[i]),
+                'end': float(ends[i]),
+                'is_current': bool(current_time <= ends[i])
+            }
+            for i in active
+        ]
+
     if not transcript_words:
         return []
 
@@ -140,43 +189,271 @@ def get_active_caption_text(transcript_words, current_time, window_size=3.0):
     return active_words
 
 
-def wrap_text(text, max_width, font, font_scale, thickness):
-    """Wrap text to fit within max_width pixels."""
-    words = text.split()
+@functools.lru_cache(maxsize=32)
+def _load_truetype(path, font_scale):
+    return ImageFont.truetype(path, max(1, round(font_scale * TRUETYPE_PIXELS_PER_SCALE)))
+
+
+def _caption_font():
+    """Font used for captions: a TrueType path if CAPTION_FONT_PATH loads, else Hershey Duplex."""
+    if CAPTION_FONT_PATH:
+        try:
+            _load_truetype(CAPTION_FONT_PATH, 1.0)
+            return CAPTION_FONT_PATH
+        except OSError as e:
+            print(f"⚠️ Could not load caption font {CAPTION_FONT_PATH}: {e}. Using the built-in font.")
+    return cv2.FONT_HERSHEY_DUPLEX
+
+
+CAPTION_FONT = _caption_font()
+
+
+@functools.lru_cache(maxsize=8192)
+def _get_text_size(text, font, font_scale, thickness):
+    """
+    cv2.getTextSize, memoized since the same words and lines are measured repeatedly.
+    For TrueType fonts, returns the advance width, ascent and descent in the same shape.
+    """
+    if isinstance(font, str):
+        truetype = _load_truetype(font, font_scale)
+        ascent, descent = truetype.getmetrics()
+        return (round(truetype.getlength(text)), ascent), descent
+    return cv2.getTextSize(text, font, font_scale, thickness)
+
+
+def _text_width(text, font, font_scale, thickness):
+    return _get_text_size(text, font, font_scale, thickness)[0][0]
+
+
+def _stroke_allowance(font, font_scale, thickness):
+    """Fixed amount cv2.getTextSize adds on top of the summed glyph advances."""
+    return 2 * _text_width('H', font, font_scale, thickness) - _text_width('HH', font, font_scale, thickness)
+
+
+@functools.lru_cache(maxsize=4096)
+def _wrap_text_cached(text, max_width, font, font_scale, thickness):
+    # Hershey advances are additive, so a line's width is its words' widths
+    # plus the spaces, less the stroke allowance each extra measurement adds
+    allowance = _stroke_allowance(font, font_scale, thickness)
+    space = _text_width(' ', font, font_scale, thickness) - allowance
+
     lines = []
     current_line = []
+    current_width = 0
 
-    for word in words:
-        test_line = ' '.join(current_line + [word])
-        (w, h), _ = cv2.getTextSize(test_line, font, font_scale, thickness)
+    for word in text.split():
+        w = _text_width(word, font, font_scale, thickness)
+        if current_line:
+            w += current_width + space - allowance
 
         if w <= max_width:
             current_line.append(word)
+            current_width = w
         else:
             if current_line:
                 lines.append(' '.join(current_line))
             current_line = [word]
+            current_width = _text_width(word, font, font_scale, thickness)
 
     if current_line:
         lines.append(' '.join(current_line))
 
-    return lines
+    return tuple(lines)
 
 
-def render_text_with_outline(frame, text, position, font, font_scale, color, outline_color, outline_thickness):
-    """Render text with outline effect."""
-    x, y = position
+def wrap_text(text, max_width, font, font_scale, thickness):
+    """Wrap text to fit within max_width pixels."""
+    return list(_wrap_text_cached(text, max_width, font, font_scale, thickness))
+
+
+# Pre-rasterized glyph tiles keyed by (char, font, font_scale, color, outline_color, outline_thickness)
+_GLYPH_CACHE = {}
+_GLYPH_CACHE_LIMIT = 4096
+
+# Composited words and lines built from those tiles, capped by pixel memory
+_TEXT_CACHE = {}
+_TEXT_CACHE_BYTES = 0
+_TEXT_CACHE_BYTES_LIMIT = 64 * 1024 * 1024
+
+
+def _text_mask(text, font, font_scale, thickness, pad):
+    """
+    Rasterize text coverage with `pad` pixels of margin, origin at (pad, pad + ascent).
+    Returns (mask, ascent).
+    """
+    (w, h), baseline = _get_text_size(text, font, font_scale, thickness)
+    size = (h + baseline + 2 * pad, w + 2 * pad)
+
+    if isinstance(font, str):
+        # FreeType fills glyph outlines; widen them as much as a Hershey stroke
+        # of this thickness is wider than the regular one
+        image = Image.new('L', size[::-1])
+        ImageDraw.Draw(image).text(
+            (pad, pad + h), text, font=_load_truetype(font, font_scale), fill=255, anchor='ls',
+            stroke_width=max(0, (thickness - 2) // 2), stroke_fill=255
+        )
+        return np.asarray(image).copy(), h
+
+    mask = np.zeros(size, dtype=np.uint8)
+    cv2.putText(mask, text, (pad, pad + h), font, font_scale, 255, thickness, cv2.LINE_AA)
+    return mask, h
 
-    # Draw outline by rendering text multiple times offset
-    if outline_color and outline_thickness > 0:
-        for dx in range(-outline_thickness, outline_thickness + 1):
-            for dy in range(-outline_thickness, outline_thickness + 1):
-                if dx != 0 or dy != 0:
-                    cv2.putText(frame, text, (x + dx, y + dy), font, font_scale,
-                               outline_color, outline_thickness, cv2.LINE_AA)
 
-    # Draw main text
-    cv2.putText(frame, text, (x, y), font, font_scale, color, 2, cv2.LINE_AA)
+def _tint(mask, color, offset_x, offset_y):
+    """Turn a coverage mask into a premultiplied layer of one colour."""
+    alpha = cv2.cvtColor(mask, cv2.COLOR_GRAY2BGR)
+    canvas = cv2.multiply(alpha, np.full_like(alpha, color), scale=1 / 255)
+    return offset_x, offset_y, canvas, 255 - alpha
+
+
+def _rasterize_layer(text, font, font_scale, color, thickness, spread):
+    """
+    Rasterize one glyph (or, for TrueType, one text run) layer, grown by `spread` pixels in every direction.
+    Returns (offset_x, offset_y, premultiplied_bgr, inverse_alpha) or None for blank glyphs.
+    """
+    pad = spread + thickness + 2
+    mask, h = _text_mask(text, font, font_scale, thickness, pad)
+
+    # Stamping the glyph at every offset within `spread` is a dilation of its mask
+    if spread:
+        mask = cv2.dilate(mask, np.ones((2 * spread + 1, 2 * spread + 1), dtype=np.uint8))
+
+    if not mask.any():
+        return None
+
+    return _tint(mask, color, -pad, -(pad + h))
+
+
+def _prerender_glyph(ch, font, font_scale, color, outline_color, outline_thickness):
+    """Get the (outline, fill) tiles for a glyph, rasterizing them on first use."""
+    key = (ch, font, font_scale, color, outline_color, outline_thickness)
+    glyph = _GLYPH_CACHE.get(key)
+    if glyph is None:
+        if len(_GLYPH_CACHE) >= _GLYPH_CACHE_LIMIT:
+            _GLYPH_CACHE.clear()
+        outline = None
+        if outline_color and outline_thickness > 0:
+            outline = _rasterize_layer(ch, font, font_scale, outline_color,
+                                       outline_thickness, outline_thickness)
+        fill = _rasterize_layer(ch, font, font_scale, color, 2, 0)
+        glyph = _GLYPH_CACHE[key] = (outline, fill)
+    return glyph
+
+
+def _glyph_positions(text, font, font_scale, thickness):
+    """X offset of each character's origin, matching cv2.putText's pen advance."""
+    allowance = _stroke_allowance(font, font_scale, thickness)
+
+    # Advances are additive, so each origin is the running sum of character widths
+    positions = [0]
+    for ch in text[:-1]:
+        positions.append(positions[-1] + _text_width(ch, font, font_scale, thickness) - allowance)
+    return positions
+
+
+def _blit_layer(frame, x, y, layer, frame_inverse_alpha=None):
+    """
+    Alpha-blend a premultiplied glyph layer into the frame, clipped to its bounds.
+    When frame is itself a layer, pass its inverse alpha so it is composited too.
+    """
+    offset_x, offset_y, color, inverse_alpha = layer
+    x += offset_x
+    y += offset_y
+    th, tw = color.shape[:2]
+    fh, fw = frame.shape[:2]
+
+    x1, y1 = max(x, 0), max(y, 0)
+    x2, y2 = min(x + tw, fw), min(y + th, fh)
+    if x1 >= x2 or y1 >= y2:
+        return
+
+    roi = frame[y1:y2, x1:x2]
+    tile = (slice(y1 - y, y2 - y), slice(x1 - x, x2 - x))
+    cv2.multiply(roi, inverse_alpha[tile], dst=roi, scale=1 / 255)
+    cv2.add(roi, color[tile], dst=roi)
+    if frame_inverse_alpha is not None:
+        roi = frame_inverse_alpha[y1:y2, x1:x2]
+        cv2.multiply(roi, inverse_alpha[tile], dst=roi, scale=1 / 255)
+
+
+def _prerender_text(text, font, font_scale, color, outline_color, outline_thickness):
+    """
+    Get a whole outlined text run as one layer, composited from glyph tiles on first use.
+    Returns (offset_x, offset_y, premultiplied_bgr, inverse_alpha) or None for blank text.
+    """
+    key = (text, font, font_scale, color, outline_color, outline_thickness)
+    layer = _TEXT_CACHE.get(key)
+    if layer is None and key not in _TEXT_CACHE:
+        if isinstance(font, str):
+            # FreeType shapes and kerns the whole run itself
+            outline = None
+            if outline_color and outline_thickness > 0:
+                outline = _rasterize_layer(text, font, font_scale, outline_color,
+                                           outline_thickness, outline_thickness)
+            glyphs = [(outline, _rasterize_layer(text, font, font_scale, color, 2, 0))]
+            outline_positions = fill_positions = [0]
+        else:
+            glyphs = [_prerender_glyph(ch, font, font_scale, color, outline_color, outline_thickness)
+                      for ch in text]
+            outline_positions = _glyph_positions(text, font, font_scale, outline_thickness)
+            fill_positions = _glyph_positions(text, font, font_scale, 2)
+
+        # Lay down every outline before any fill so neighbouring outlines never cover text
+        placed = []
+        if outline_color and outline_thickness > 0:
+            placed += [(gx, outline) for gx, (outline, _) in zip(outline_positions, glyphs) if outline is not None]
+        placed += [(gx, fill) for gx, (_, fill) in zip(fill_positions, glyphs) if fill is not None]
+
+        if placed:
+            x1 = min(gx + g[0] for gx, g in placed)
+            y1 = min(g[1] for _, g in placed)
+            x2 = max(gx + g[0] + g[2].shape[1] for gx, g in placed)
+            y2 = max(g[1] + g[2].shape[0] for _, g in placed)
+
+            canvas = np.zeros((y2 - y1, x2 - x1, 3), dtype=np.uint8)
+            inverse_alpha = np.full_like(canvas, 255)
+            for gx, glyph in placed:
+                _blit_layer(canvas, gx - x1, -y1, glyph, inverse_alpha)
+            layer = (x1, y1, canvas, inverse_alpha)
+
+        _cache_text_layer(key, layer)
+    return layer
+
+
+def _prerender_glow(text, font, font_scale, color, thickness):
+    """Get a soft glow behind text as one layer: a thick stroke blurred once, on first use."""
+    key = ('glow', text, font, font_scale, color, thickness)
+    layer = _TEXT_CACHE.get(key)
+    if layer is None and key not in _TEXT_CACHE:
+        sigma = thickness * 2
+        stroke = thickness + 6
+        pad = 3 * sigma + stroke
+        mask, h = _text_mask(text, font, font_scale, stroke, pad)
+
+        if mask.any():
+            mask = cv2.GaussianBlur(mask, (0, 0), sigmaX=sigma)
+            layer = _tint(mask, color, -pad, -(pad + h))
+
+        _cache_text_layer(key, layer)
+    return layer
+
+
+def _cache_text_layer(key, layer):
+    global _TEXT_CACHE_BYTES
+    if _TEXT_CACHE_BYTES >= _TEXT_CACHE_BYTES_LIMIT:
+        _TEXT_CACHE.clear()
+        _TEXT_CACHE_BYTES = 0
+    _TEXT_CACHE[key] = layer
+    if layer is not None:
+        _TEXT_CACHE_BYTES += 2 * layer[2].nbytes
+
+
+def render_text_with_outline(frame, text, position, font, font_scale, color, outline_color, outline_thickness):
+    """Render text with outline effect."""
+    layer = _prerender_text(text, font, font_scale, color, outline_color, outline_thickness)
+    if layer is not None:
+        x, y = position
+        _blit_layer(frame, x, y, layer)
 
 
 def render_karaoke_text(frame, words, position, font, font_scale, config):
@@ -196,7 +473,7 @@ def render_karaoke_text(frame, words, position, font, font_scale, config):
         color = config.get('highlight_color', (0, 255, 255)) if is_current else config['color']
 
         # Get text size
-        (w, h), _ = cv2.getTextSize(word, font, font_scale, 2)
+        (w, h), _ = _get_text_size(word, font, font_scale, 2)
 
         # Render with outline
         render_text_with_outline(
@@ -207,39 +484,16 @@ def render_karaoke_text(frame, words, position, font, font_scale, config):
         current_x += w
 
 
-def render_caption_on_frame(frame, transcript_words, current_time, style_name="classic",
-                            custom_color=None, custom_outline_color=None):
+def layout_caption(active_words, config, width, height):
     """
-    Main function to render captions on a video frame.
-
-    Args:
-        frame: OpenCV frame (numpy array)
-        transcript_words: List of word dicts with 'word', 'start', 'end' keys
-        current_time: Current timestamp in seconds
-        style_name: Name of the caption style preset
-        custom_color: Optional hex color for text (e.g., "#FFFFFF")
-        custom_outline_color: Optional hex color for outline (e.g., "#000000")
+    Wrap the active words into centred lines near the bottom of the frame.
 
     Returns:
-        Frame with captions rendered
+        Dict with 'font_scale', 'lines' as (text, x, baseline_y) tuples,
+        'box' (x1, y1, x2, y2) for styles with a background (else None),
+        and the 'left'/'right' and 'top'/'bottom' extent of the caption text.
     """
-    if not transcript_words:
-        return frame
-
-    # Get active words for this timestamp
-    active_words = get_active_caption_text(transcript_words, current_time)
-
-    if not active_words:
-        return frame
-
-    # Get style configuration
-    config = get_style_config(style_name, custom_color, custom_outline_color)
-
-    # Frame dimensions
-    height, width = frame.shape[:2]
-
-    # Font settings
-    font = cv2.FONT_HERSHEY_DUPLEX
+    font = CAPTION_FONT
     font_scale = config['font_scale'] * (width / 1080)  # Scale based on width
 
     # Build caption text
@@ -256,44 +510,69 @@ def render_caption_on_frame(frame, transcript_words, current_time, style_name="c
     lines = wrap_text(caption_text, max_text_width, font, font_scale, 2)
 
     # Calculate total text block height
-    line_heights = []
-    for line in lines:
-        (w, h), baseline = cv2.getTextSize(line, font, font_scale, 2)
-        line_heights.append(h + baseline + 10)
-
-    total_height = sum(line_heights)
+    metrics = [_get_text_size(line, font, font_scale, 2) for line in lines]
+    total_height = sum(h + baseline + 10 for (w, h), baseline in metrics)
 
     # Position at bottom of frame (10% from bottom)
     y_start = int(height * 0.85) - total_height
 
-    # Render background box if style requires it
+    box = None
     if config.get('background'):
-        bg_color = config['background']
         padding = 15
+        max_line_width = max((w for (w, h), _ in metrics), default=0)
+        box = ((width - max_line_width) // 2 - padding,
+               y_start - padding,
+               (width + max_line_width) // 2 + padding,
+               y_start + total_height + padding)
+
+    placed = []
+    current_y = y_start
+    for line, ((w, h), baseline) in zip(lines, metrics):
+        x = (width - w) // 2  # Center horizontally
+        current_y += h
+        placed.append((line, x, current_y))
+        current_y += baseline + 10
+
+    return {
+        'font_scale': font_scale,
+        'lines': placed,
+        'box': box,
+        'left': min((x for _, x, _ in placed), default=0),
+        'right': max((x + w for (_, x, _), ((w, _), _) in zip(placed, metrics)), default=0),
+        'top': y_start,
+        'bottom': y_start + total_height,
+    }
+
+
+def draw_caption(frame, layout, active_words, config, style_name, top=0, left=0):
+    """
+    Draw a laid-out caption onto frame.
+    `top`/`left` are the video-frame row and column that frame's first pixel
+    corresponds to, so the caption can be drawn onto a tile instead of a whole frame.
 
-        # Calculate max line width
-        max_line_width = 0
-        for line in lines:
-            (w, h), _ = cv2.getTextSize(line, font, font_scale, 2)
-            max_line_width = max(max_line_width, w)
+    Returns:
+        Frame with the caption drawn
+    """
+    font = CAPTION_FONT
+    font_scale = layout['font_scale']
 
-        # Draw semi-transparent background
-        overlay = frame.copy()
-        x1 = (width - max_line_width) // 2 - padding
-        y1 = y_start - padding
-        x2 = (width + max_line_width) // 2 + padding
-        y2 = y_start + total_height + padding
+    # Render background box if style requires it
+    if layout['box']:
+        bg_color = config['background']
+        x1, y1, x2, y2 = layout['box']
+        x1, x2 = x1 - left, x2 - left
 
-        cv2.rectangle(overlay, (x1, y1), (x2, y2), bg_color[:3], -1)
-        alpha = bg_color[3] / 255.0 if len(bg_color) > 3 else 0.7
-        frame = cv2.addWeighted(overlay, alpha, frame, 1 - alpha, 0)
+        # Draw semi-transparent background, blending only the box itself
+        # (the rectangle is inclusive of its far corner)
+        roi = frame[max(y1 - top, 0):max(y2 - top + 1, 0), max(x1, 0):max(x2 + 1, 0)]
+        if roi.size:
+            alpha = bg_color[3] / 255.0 if len(bg_color) > 3 else 0.7
+            cv2.addWeighted(roi, 1 - alpha, np.full_like(roi, bg_color[:3]), alpha, 0, dst=roi)
 
     # Render each line
-    current_y = y_start
-    for line in lines:
-        (w, h), baseline = cv2.getTextSize(line, font, font_scale, 2)
-        x = (width - w) // 2  # Center horizontally
-        current_y += h
+    for line, x, current_y in layout['lines']:
+        x -= left
+        current_y -= top
 
         if style_name == "karaoke":
             # For karaoke, we need to render word by word
@@ -302,10 +581,10 @@ def render_caption_on_frame(frame, transcript_words, current_time, style_name="c
             render_karaoke_text(frame, line_words, (x, current_y), font, font_scale, config)
         elif style_name == "neon" and config.get('glow'):
             # Render glow effect
-            for i in range(3, 0, -1):
-                glow_color = tuple(min(255, c + 50) for c in config['color'])
-                cv2.putText(frame, line, (x, current_y), font, font_scale,
-                           glow_color, config['outline_thickness'] + i * 2, cv2.LINE_AA)
+            glow_color = tuple(min(255, c + 50) for c in config['color'])
+            glow = _prerender_glow(line, font, font_scale, glow_color, config['outline_thickness'])
+            if glow is not None:
+                _blit_layer(frame, x, current_y, glow)
             render_text_with_outline(frame, line, (x, current_y), font, font_scale,
                                     config['color'], config.get('outline_color'),
                                     config.get('outline_thickness', 2))
@@ -315,11 +594,187 @@ def render_caption_on_frame(frame, transcript_words, current_time, style_name="c
                                     config['color'], config.get('outline_color'),
                                     config.get('outline_thickness', 2))
 
-        current_y += baseline + 10
-
     return frame
 
 
+def render_caption_on_frame(frame, transcript_words, current_time, style_name="classic",
+                            custom_color=None, custom_outline_color=None):
+    """
+    Main function to render captions on a video frame.
+
+    Args:
+        frame: OpenCV frame (numpy array)
+        transcript_words: List of word dicts with 'word', 'start', 'end' keys
+        current_time: Current timestamp in seconds
+        style_name: Name of the caption style preset
+        custom_color: Optional hex color for text (e.g., "#FFFFFF")
+        custom_outline_color: Optional hex color for outline (e.g., "#000000")
+
+    Returns:
+        Frame with captions rendered
+    """
+    if not transcript_words:
+        return frame
+
+    # Get active words for this timestamp
+    active_words = get_active_caption_text(transcript_words, current_time)
+
+    if not active_words:
+        return frame
+
+    # Get style configuration
+    config = _style_config_cached(style_name, custom_color, custom_outline_color)
+
+    # Frame dimensions
+    height, width = frame.shape[:2]
+
+    layout = layout_caption(active_words, config, width, height)
+    return draw_caption(frame, layout, active_words, config, style_name)
+
+
+# Extra rows rendered around a caption block so outlines, glow and box padding fit
+OVERLAY_MARGIN = 32
+
+
+class CaptionPlan:
+    """
+    Caption timeline for one clip.
+
+    The set of visible words only changes at word start/end times (and when a
+    word leaves the display window), so the timeline is split at those change
+    points once. Each distinct caption is rendered into a small premultiplied
+    overlay the first time it is shown and reused until the caption changes,
+    leaving a ROI-sized alpha blend as the only per-frame work.
+    """
+
+    def __init__(self, transcript_words, width, height, style_name="classic",
+                 custom_color=None, custom_outline_color=None, window_size=3.0):
+        self.width = width
+        self.height = height
+        self.style_name = style_name
+        self.config = _style_config_cached(style_name, custom_color, custom_outline_color)
+
+        self.starts, self.ends, self.texts = prepare_transcript_arrays(transcript_words)
+        self.window_ends = self.ends + window_size
+        # Latest window end seen so far; lets a search skip words that have all expired
+        self.reach = np.maximum.accumulate(self.window_ends)
+
+        # Change points, plus the visible words exactly at and between each pair
+        # of them (the display window bounds are inclusive)
+        self.points = np.unique(np.concatenate((self.starts, self.ends, self.window_ends))).tolist()
+
+        # Each distinct caption is stored once; segments refer to it by id,
+        # and id 0 is the empty caption
+        self.captions = [()]
+        caption_ids = {(): 0}
+        self.segments = []
+        for i, point in enumerate(self.points):
+            times = [point] if i + 1 == len(self.points) else [point, (point + self.points[i + 1]) / 2]
+            for t in times:
+                key = self._active_key(t)
+                if key not in caption_ids:
+                    caption_ids[key] = len(self.captions)
+                    self.captions.append(key)
+                self.segments.append(caption_ids[key])
+
+        self._overlay_id = 0
+        self._overlay = None
+
+    def _active_key(self, t):
+        lo = np.searchsorted(self.reach, t, side='left')
+        hi = np.searchsorted(self.starts, t, side='right')
+        if lo >= hi:
+            return ()
+        active = lo + np.flatnonzero(t <= self.window_ends[lo:hi])
+        return tuple((int(i), bool(t <= self.ends[i])) for i in active)
+
+    def caption_at(self, t):
+        """Id of the caption visible at time t (0 when nothing is shown)."""
+        i = bisect.bisect_left(self.points, t)
+        if i < len(self.points) and self.points[i] == t:
+            return self.segments[2 * i]
+        if i == 0 or i == len(self.points):
+            return 0
+        return self.segments[2 * i - 1]
+
+    def overlay_for(self, caption_id):
+        """Premultiplied overlay layer for a caption, rendered on first use."""
+        if caption_id != self._overlay_id:
+            self._overlay_id = caption_id
+            self._overlay = self._render_overlay(self.captions[caption_id])
+        return self._overlay
+
+    def _render_overlay(self, key):
+        # Word dicts are only built here, once per distinct caption
+        active_words = [
+            {'word': self.texts[i], 'start': float(self.starts[i]), 'end': float(self.ends[i]), 'is_current': current}
+            for i, current in key
+        ]
+        layout = layout_caption(active_words, self.config, self.width, self.height)
+
+        # Only the tile around the caption is drawn, not a full-width band
+        left, top, right, bottom = layout['left'], layout['top'], layout['right'], layout['bottom']
+        if layout['box']:
+            box_x1, box_y1, box_x2, box_y2 = layout['box']
+            left, top = min(left, box_x1), min(top, box_y1)
+            right, bottom = max(right, box_x2 + 1), max(bottom, box_y2 + 1)
+        left, top = max(left - OVERLAY_MARGIN, 0), max(top - OVERLAY_MARGIN, 0)
+        right, bottom = min(right + OVERLAY_MARGIN, self.width), min(bottom + OVERLAY_MARGIN, self.height)
+        if left >= right or top >= bottom:
+            return None
+
+        # Drawing the caption over black and over white recovers both its
+        # premultiplied colour and its per-channel transparency
+        on_black = np.zeros((bottom - top, right - left, 3), dtype=np.uint8)
+        on_white = np.full_like(on_black, 255)
+        on_black = draw_caption(on_black, layout, active_words, self.config, self.style_name, top, left)
+        on_white = draw_caption(on_white, layout, active_words, self.config, self.style_name, top, left)
+
+        inverse_alpha = on_white - on_black
+        untouched = cv2.inRange(inverse_alpha, (255, 255, 255), (255, 255, 255))
+        x1, y1, w, h = cv2.boundingRect(cv2.bitwise_not(untouched))
+        if not w or not h:
+            return None
+
+        y2, x2 = y1 + h, x1 + w
+        return (left + x1, top + y1,
+                np.ascontiguousarray(on_black[y1:y2, x1:x2]),
+                np.ascontiguousarray(inverse_alpha[y1:y2, x1:x2]))
+
+    def apply(self, frame, t):
+        """Composite the caption visible at time t onto frame in place."""
+        caption_id = self.caption_at(t)
+        if caption_id:
+            overlay = self.overlay_for(caption_id)
+            if overlay is not None:
+                _blit_layer(frame, 0, 0, overlay)
+        return frame
+
+
+def make_caption_renderer(width, height, transcript_words, style_name="classic",
+                          custom_color=None, custom_outline_color=None):
+    """
+    Specialise caption rendering to one clip.
+
+    Everything that is fixed for the clip (style config, transcript arrays,
+    caption timeline) is resolved here once; the returned render(frame, t)
+    only looks up the caption for t and blends its overlay.
+
+    Args:
+        width, height: Output frame dimensions
+        transcript_words: List of word dicts with 'word', 'start', 'end' keys
+        style_name: Name of the caption style preset
+        custom_color: Optional hex color for text (e.g., "#FFFFFF")
+        custom_outline_color: Optional hex color for outline (e.g., "#000000")
+
+    Returns:
+        Function render(frame, t) that draws the captions for time t onto frame
+    """
+    plan = CaptionPlan(transcript_words, width, height, style_name,
+                       custom_color, custom_outline_color)
+    return plan.apply
+
+
 def extract_words_from_transcript(transcript_result):
     """
     Extract flat list of words from transcript result.
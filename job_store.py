@@ -1,76 +1,261 @@
-from typing import Optional, Any
+import os
+import time
+import orjson
+from typing import Optional, Any, List, Tuple
 from datetime import datetime
+from cryptography.fernet import Fernet, InvalidToken
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
+from pydantic_core import to_json
 from models import JobData, JobStatus, JobResult
 
 JOB_TTL_SECONDS = 24 * 60 * 60  # 24 hours
 JOB_KEY_PREFIX = "openshorts:job:"
+JOB_QUEUE_KEY = "openshorts:queue:v2"
+# Jobs a worker has claimed but not finished; requeued if the worker dies
+PROCESSING_KEY_PREFIX = "openshorts:processing:v2:"
+WORKER_KEY_PREFIX = "openshorts:worker:"
+MAX_LOG_LINES = 500  # roughly this many recent log lines are kept per job
+# Reads of the same job within this window are served from memory
+JOB_CACHE_SECONDS = 0.05
+JOB_CACHE_MAX_ENTRIES = 1024
+
+_api_key_cipher: Optional[Fernet] = None
+
+
+def _get_api_key_cipher() -> Fernet:
+    """Cipher for API keys at rest. Uses API_KEY_SECRET, else a per-process key."""
+    global _api_key_cipher
+
+    if _api_key_cipher is None:
+        secret = os.environ.get("API_KEY_SECRET")
+        if not secret:
+            print("⚠️ API_KEY_SECRET not set, API keys of queued jobs won't survive a restart")
+            secret = Fernet.generate_key()
+        _api_key_cipher = Fernet(secret)
+
+    return _api_key_cipher
+
+
+class ApiKeyUnreadable(Exception):
+    """A job's stored API key could not be decrypted, e.g. it was encrypted with another API_KEY_SECRET."""
 
 
 class RedisJobStore:
     def __init__(self, redis: Redis):
         self.redis = redis
+        self._cache: dict[str, Tuple[float, JobData]] = {}
 
     def _key(self, job_id: str) -> str:
-        return f"{JOB_KEY_PREFIX}{job_id}"
+        # A hash of JSON-encoded fields; the old whole-document strings simply expire
+        return JOB_KEY_PREFIX + job_id + ":fields"
+
+    def _logs_key(self, job_id: str) -> str:
+        # A capped stream; the old ":logs" lists simply expire
+        return JOB_KEY_PREFIX + job_id + ":logstream"
+
+    def _api_key_key(self, job_id: str) -> str:
+        return JOB_KEY_PREFIX + job_id + ":api_key"
 
-    async def create_job(self, job: JobData) -> None:
-        """Store a new job in Redis with TTL."""
-        key = self._key(job.job_id)
-        data = job.model_dump_json()
-        await self.redis.set(key, data, ex=JOB_TTL_SECONDS)
+    def _save(self, pipe: Pipeline, job: JobData) -> None:
+        """Queue a write of every job field (logs live in their own stream)."""
+        self._update(pipe, job.job_id, {
+            field: getattr(job, field) for field in JobData.model_fields if field != "logs"
+        })
 
-    async def get_job(self, job_id: str) -> Optional[JobData]:
-        """Retrieve a job from Redis."""
+    def _update(self, pipe: Pipeline, job_id: str, values: dict[str, Any]) -> None:
+        """Queue a write of just the given job fields, refreshing the TTL."""
+        self._cache.pop(job_id, None)
         key = self._key(job_id)
-        data = await self.redis.get(key)
-        if data:
-            return JobData.model_validate_json(data)
-        return None
+        pipe.hset(key, mapping={field: to_json(value) for field, value in values.items()})
+        pipe.expire(key, JOB_TTL_SECONDS)
 
-    async def update_job(self, job_id: str, **updates: Any) -> Optional[JobData]:
-        """Update specific fields of a job."""
-        job = await self.get_job(job_id)
-        if not job:
+    @staticmethod
+    def _parse(fields: dict) -> Optional[JobData]:
+        # An update racing the TTL can leave a partial hash behind; treat it as gone
+        if "job_id" not in fields:
             return None
+        return JobData.model_validate({field: orjson.loads(value) for field, value in fields.items()})
 
-        for field, value in updates.items():
-            if hasattr(job, field):
-                setattr(job, field, value)
+    def _push_logs(self, pipe: Pipeline, job_id: str, messages: List[str]) -> None:
+        """Queue an append of log messages, trimming old lines and refreshing the TTL."""
+        logs_key = self._logs_key(job_id)
+        for message in messages:
+            pipe.xadd(logs_key, {"line": message}, maxlen=MAX_LOG_LINES, approximate=True)
+        pipe.expire(logs_key, JOB_TTL_SECONDS)
 
-        # Reset TTL on update
-        await self.create_job(job)
+    async def _load(self, job_id: str) -> Optional[JobData]:
+        """Retrieve the job without its logs. The result is shared briefly, so don't mutate it."""
+        now = time.monotonic()
+        cached = self._cache.get(job_id)
+        if cached and now - cached[0] < JOB_CACHE_SECONDS:
+            return cached[1]
+
+        job = self._parse(await self.redis.hgetall(self._key(job_id)))
+        if job:
+            if len(self._cache) >= JOB_CACHE_MAX_ENTRIES:
+                self._cache.clear()
+            self._cache[job_id] = (now, job)
         return job
 
+    async def _write(self, job_id: str, values: dict[str, Any]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        self._update(pipe, job_id, values)
+        await pipe.execute()
+
+    def _create(self, pipe: Pipeline, job: JobData, api_key: Optional[str]) -> None:
+        """Queue the writes for a new job and its encrypted API key."""
+        self._save(pipe, job)
+        pipe.delete(self._logs_key(job.job_id))
+        if job.logs:
+            self._push_logs(pipe, job.job_id, job.logs)
+        if api_key:
+            token = _get_api_key_cipher().encrypt(api_key.encode())
+            pipe.set(self._api_key_key(job.job_id), token, ex=JOB_TTL_SECONDS)
+
+    async def create_job(self, job: JobData, api_key: Optional[str] = None) -> None:
+        """Store a new job in Redis with TTL, plus its encrypted API key if given."""
+        pipe = self.redis.pipeline(transaction=False)
+        self._create(pipe, job, api_key)
+        await pipe.execute()
+
+    async def create_and_enqueue(self, job: JobData, api_key: Optional[str] = None) -> None:
+        """Store a new job and push it onto the work queue in one round trip."""
+        await self.create_and_enqueue_many([job], api_key)
+
+    async def create_and_enqueue_many(self, jobs: List[JobData], api_key: Optional[str] = None) -> None:
+        """Store new jobs and push them onto the work queue, in order, in one round trip."""
+        pipe = self.redis.pipeline(transaction=False)
+        for job in jobs:
+            self._create(pipe, job, api_key)
+        pipe.rpush(JOB_QUEUE_KEY, *(job.job_id for job in jobs))
+        await pipe.execute()
+
+    async def get_api_key(self, job_id: str) -> Optional[str]:
+        """Fetch a job's API key. Returns None if none was stored; raises ApiKeyUnreadable if it can't be decrypted."""
+        token = await self.redis.get(self._api_key_key(job_id))
+        if not token:
+            return None
+        try:
+            return _get_api_key_cipher().decrypt(token).decode()
+        except InvalidToken:
+            raise ApiKeyUnreadable(job_id) from None
+
+    async def claim_job(self, worker_id: str, timeout: float = 0) -> Optional[str]:
+        """Block until a job is queued and move it to this worker's processing list."""
+        return await self.redis.blmove(
+            JOB_QUEUE_KEY, PROCESSING_KEY_PREFIX + worker_id, timeout, "LEFT", "RIGHT"
+        )
+
+    async def ack_job(self, worker_id: str, job_id: str) -> None:
+        """Mark a claimed job as done and drop its API key."""
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.lrem(PROCESSING_KEY_PREFIX + worker_id, 1, job_id)
+        pipe.delete(self._api_key_key(job_id))
+        await pipe.execute()
+
+    async def heartbeat(self, worker_id: str, ttl: int) -> None:
+        """Signal that a worker is alive; its claimed jobs are safe for ttl seconds."""
+        await self.redis.set(WORKER_KEY_PREFIX + worker_id, 1, ex=ttl)
+
+    async def requeue_worker_jobs(self, worker_id: str) -> int:
+        """Move a worker's claimed jobs back to the front of the queue."""
+        moved = 0
+        while await self.redis.lmove(
+            PROCESSING_KEY_PREFIX + worker_id, JOB_QUEUE_KEY, "RIGHT", "LEFT"
+        ):
+            moved += 1
+        return moved
+
+    async def requeue_orphaned_jobs(self) -> int:
+        """Requeue jobs claimed by workers whose heartbeat has expired."""
+        moved = 0
+        async for key in self.redis.scan_iter(match=PROCESSING_KEY_PREFIX + "*"):
+            worker_id = key[len(PROCESSING_KEY_PREFIX):]
+            if not await self.redis.exists(WORKER_KEY_PREFIX + worker_id):
+                moved += await self.requeue_worker_jobs(worker_id)
+        return moved
+
+    async def get_job(self, job_id: str, with_logs: bool = True) -> Optional[JobData]:
+        """Retrieve a job from Redis; the document and its logs come back in one round trip."""
+        if not with_logs:
+            return await self._load(job_id)
+
+        job, _ = await self.get_job_with_logs_since(job_id)
+        return job
+
+    async def get_job_with_logs_since(
+        self, job_id: str, since_id: Optional[str] = None
+    ) -> Tuple[Optional[JobData], Optional[str]]:
+        """Retrieve a job with the log lines after log entry since_id (all lines if None).
+
+        Also returns the ID of the newest log entry seen, to pass as since_id next time.
+        """
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.hgetall(self._key(job_id))
+        pipe.xrange(self._logs_key(job_id), min=f"({since_id}" if since_id else "-")
+        fields, entries = await pipe.execute()
+        job = self._parse(fields)
+        if not job:
+            return None, None
+
+        job.logs = [fields["line"] for _, fields in entries]
+        last_log_id = entries[-1][0] if entries else since_id
+        return job, last_log_id
+
+    async def update_job(self, job_id: str, **updates: Any) -> None:
+        """Update specific fields of a job."""
+        values = {
+            field: value for field, value in updates.items()
+            if field in JobData.model_fields and field != "logs"
+        }
+        if values:
+            # Reset TTL on update
+            await self._write(job_id, values)
+
     async def append_log(self, job_id: str, message: str) -> None:
         """Append a log message to job."""
-        job = await self.get_job(job_id)
-        if job:
-            job.logs.append(message)
-            await self.create_job(job)
+        await self.append_logs(job_id, [message])
+
+    async def append_logs(
+        self,
+        job_id: str,
+        messages: List[str],
+        progress: Optional[Tuple[int, Optional[str]]] = None
+    ) -> None:
+        """Append a batch of log messages, plus the latest progress, in one pipelined write."""
+        pipe = self.redis.pipeline(transaction=False)
+        if messages:
+            self._push_logs(pipe, job_id, messages)
+        if progress:
+            percentage, stage = progress
+            values: dict[str, Any] = {"progress_percentage": percentage}
+            if stage:
+                values["progress_stage"] = stage
+            self._update(pipe, job_id, values)
+        await pipe.execute()
 
     async def set_status(
         self,
         job_id: str,
         status: JobStatus,
-        error: Optional[str] = None
+        error: Optional[str] = None,
+        result: Optional[JobResult] = None
     ) -> None:
-        """Update job status with appropriate timestamps."""
-        job = await self.get_job(job_id)
-        if not job:
-            return
-
-        job.status = status
+        """Update job status with appropriate timestamps, optionally storing the result."""
+        values: dict[str, Any] = {"status": status}
         now = datetime.utcnow()
 
         if status == JobStatus.PROCESSING:
-            job.started_at = now
+            values["started_at"] = now
         elif status in (JobStatus.COMPLETED, JobStatus.FAILED):
-            job.completed_at = now
+            values["completed_at"] = now
             if error:
-                job.error = error
+                values["error"] = error
+        if result is not None:
+            values["result"] = result
 
-        await self.create_job(job)
+        await self._write(job_id, values)
 
     async def update_progress(
         self,
@@ -20,7 +20,9 @@ import mediapipe as mp
 from google import genai
 from dotenv import load_dotenv
 import json
-from caption_renderer import render_caption_on_frame, extract_words_from_transcript
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from caption_renderer import make_caption_renderer, extract_words_from_transcript
 
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module='google.protobuf')
@@ -31,6 +33,9 @@ load_dotenv()
 # --- Constants ---
 ASPECT_RATIO = 9 / 16
 
+# Clips rendered in parallel, each in its own process (1 = one after another)
+CLIP_WORKERS = max(1, int(os.environ.get("CLIP_WORKERS", "1")))
+
 GEMINI_PROMPT_TEMPLATE = """
 You are a senior short-form video editor. Read the transcript and word-level timestamps to choose the 3–15 MOST VIRAL moments for TikTok/IG Reels/YouTube Shorts. Each clip must be between 15 and 60 seconds long.
 
@@ -911,6 +916,16 @@ def process_video_to_vertical(input_video, final_output_video, transcript_words=
     # Global tracker for single-person shots
     speaker_tracker = SpeakerTracker(cooldown_frames=30)
 
+    # Build the caption renderer once for the whole clip
+    render_captions = None
+    if caption_style and caption_style != 'none' and transcript_words:
+        render_captions = make_caption_renderer(
+            OUTPUT_WIDTH, OUTPUT_HEIGHT, transcript_words,
+            style_name=caption_style,
+            custom_color=caption_color,
+            custom_outline_color=caption_outline_color
+        )
+
     with tqdm(total=total_frames, desc="   Processing", file=sys.stdout) as pbar:
         while cap.isOpened():
             ret, frame = cap.read()
@@ -962,14 +977,8 @@ def process_video_to_vertical(input_video, final_output_video, transcript_words=
                     output_frame = cv2.resize(frame, (OUTPUT_WIDTH, OUTPUT_HEIGHT))
 
             # Render captions if enabled
-            if caption_style and caption_style != 'none' and transcript_words:
-                current_time = frame_number / fps
-                output_frame = render_caption_on_frame(
-                    output_frame, transcript_words, current_time,
-                    style_name=caption_style,
-                    custom_color=caption_color,
-                    custom_outline_color=caption_outline_color
-                )
+            if render_captions:
+                output_frame = render_captions(output_frame, frame_number / fps)
 
             ffmpeg_process.stdin.write(output_frame.tobytes())
             frame_number += 1
@@ -1160,6 +1169,55 @@ def get_viral_clips(transcript_result, video_duration):
             print(f"❌ Gemini raw response (first 500 chars): {response.text[:500]}")
         return None
 
+def _line_buffered_output():
+    """Pool initializer: spawned workers don't inherit -u, so flush their output per line."""
+    sys.stdout.reconfigure(line_buffering=True)
+    sys.stderr.reconfigure(line_buffering=True)
+
+
+def process_clip(i, clip, input_video, output_dir, video_title, all_words,
+                 caption_style=None, caption_color=None, caption_outline_color=None):
+    """
+    Cut one clip out of the source video and render it vertically with captions.
+    Runs in a worker process when CLIP_WORKERS > 1.
+    """
+    start = clip['start']
+    end = clip['end']
+    print(f"\n🎬 Processing Clip {i+1}: {start}s - {end}s")
+    print(f"   Title: {clip.get('video_title_for_youtube_short', 'No Title')}")
+
+    # Cut clip
+    clip_filename = f"{video_title}_clip_{i+1}.mp4"
+    clip_temp_path = os.path.join(output_dir, f"temp_{clip_filename}")
+    clip_final_path = os.path.join(output_dir, clip_filename)
+
+    # ffmpeg cut
+    # Using re-encoding for precision as requested by strict seconds
+    cut_command = [
+        'ffmpeg', '-y', 
+        '-ss', str(start), 
+        '-to', str(end), 
+        '-i', input_video,
+        '-c:v', 'libx264', '-crf', '18', '-preset', 'fast',
+        '-c:a', 'aac',
+        clip_temp_path
+    ]
+    subprocess.run(cut_command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    # Process vertical with captions
+    success = process_video_to_vertical(clip_temp_path, clip_final_path, all_words,
+                                        caption_style, caption_color, caption_outline_color)
+
+    if success:
+        print(f"   ✅ Clip {i+1} ready: {clip_final_path}")
+
+    # Clean up temp cut
+    if os.path.exists(clip_temp_path):
+        os.remove(clip_temp_path)
+
+    return success
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="AutoCrop-Vertical with Viral Clip Detection.")
     
@@ -1289,40 +1347,24 @@ if __name__ == '__main__':
             print(f"   Saved metadata to {metadata_file}")
 
             # 5. Process each clip
-            for i, clip in enumerate(clips_data['shorts']):
-                start = clip['start']
-                end = clip['end']
-                print(f"\n🎬 Processing Clip {i+1}: {start}s - {end}s")
-                print(f"   Title: {clip.get('video_title_for_youtube_short', 'No Title')}")
-                
-                # Cut clip
-                clip_filename = f"{video_title}_clip_{i+1}.mp4"
-                clip_temp_path = os.path.join(output_dir, f"temp_{clip_filename}")
-                clip_final_path = os.path.join(output_dir, clip_filename)
-                
-                # ffmpeg cut
-                # Using re-encoding for precision as requested by strict seconds
-                cut_command = [
-                    'ffmpeg', '-y', 
-                    '-ss', str(start), 
-                    '-to', str(end), 
-                    '-i', input_video,
-                    '-c:v', 'libx264', '-crf', '18', '-preset', 'fast',
-                    '-c:a', 'aac',
-                    clip_temp_path
-                ]
-                subprocess.run(cut_command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-
-                # Process vertical with captions
-                success = process_video_to_vertical(clip_temp_path, clip_final_path, all_words,
-                                                      caption_style, caption_color, caption_outline_color)
-                
-                if success:
-                    print(f"   ✅ Clip {i+1} ready: {clip_final_path}")
-                
-                # Clean up temp cut
-                if os.path.exists(clip_temp_path):
-                    os.remove(clip_temp_path)
+            shorts = clips_data['shorts']
+            clip_args = (input_video, output_dir, video_title, all_words,
+                         caption_style, caption_color, caption_outline_color)
+            workers = min(CLIP_WORKERS, len(shorts))
+            if workers > 1:
+                # Clips are independent, so render them in separate processes; each
+                # worker loads its own detection models and caption caches
+                print(f"   Rendering clips with {workers} worker processes")
+                with ProcessPoolExecutor(max_workers=workers,
+                                         mp_context=multiprocessing.get_context('spawn'),
+                                         initializer=_line_buffered_output) as pool:
+                    futures = [pool.submit(process_clip, i, clip, *clip_args)
+                               for i, clip in enumerate(shorts)]
+                    for future in futures:
+                        future.result()
+            else:
+                for i, clip in enumerate(shorts):
+                    process_clip(i, clip, *clip_args)
 
     # Clean up original if requested
     if args.url and not args.keep_original and os.path.exists(input_video):
@@ -70,6 +70,7 @@ class JobStatusResponse(BaseModel):
     progress_percentage: int
     progress_stage: Optional[str]
     logs: List[str]
+    last_log_id: Optional[str] = None  # pass as since_id to fetch only newer lines
     created_at: str
     started_at: Optional[str]
     error: Optional[str]
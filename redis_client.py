@@ -1,41 +1,72 @@
 import os
+import asyncio
 from typing import Optional
 from redis.asyncio import Redis, ConnectionPool
 
+try:
+    from fakeredis import aioredis as fake_aioredis
+except ImportError:
+    fake_aioredis = None
+
 _redis_pool: Optional[ConnectionPool] = None
 _redis_client: Optional[Redis] = None
+_redis_ready = False
+_redis_lock = asyncio.Lock()
 
 
 async def get_redis() -> Optional[Redis]:
-    """Get Redis client. Returns None if REDIS_URL not configured."""
-    global _redis_pool, _redis_client
+    """Get Redis client. Without REDIS_URL, falls back to an in-memory store if fakeredis is installed."""
+    global _redis_pool, _redis_client, _redis_ready
 
     redis_url = os.environ.get("REDIS_URL")
     if not redis_url:
+        return _get_memory_redis()
+
+    if _redis_ready:
+        return _redis_client
+
+    async with _redis_lock:
+        if _redis_ready:
+            return _redis_client
+
+        if _redis_client is None:
+            _redis_pool = ConnectionPool.from_url(
+                redis_url,
+                max_connections=10,
+                decode_responses=True
+            )
+            _redis_client = Redis(connection_pool=_redis_pool)
+
+        # Test connection once; the pool reconnects on its own afterwards
+        try:
+            await _redis_client.ping()
+        except Exception as e:
+            print(f"Redis connection failed: {e}")
+            return None
+
+        _redis_ready = True
+        return _redis_client
+
+
+def _get_memory_redis() -> Optional[Redis]:
+    """In-process stand-in for single-instance setups; jobs are lost on restart."""
+    global _redis_client
+
+    if fake_aioredis is None:
         return None
 
     if _redis_client is None:
-        _redis_pool = ConnectionPool.from_url(
-            redis_url,
-            max_connections=10,
-            decode_responses=True
-        )
-        _redis_client = Redis(connection_pool=_redis_pool)
-
-    # Test connection
-    try:
-        await _redis_client.ping()
-    except Exception as e:
-        print(f"Redis connection failed: {e}")
-        return None
+        print("⚠️ REDIS_URL not set, keeping jobs in memory")
+        _redis_client = fake_aioredis.FakeRedis(decode_responses=True)
 
     return _redis_client
 
 
 async def close_redis():
     """Close Redis connection pool."""
-    global _redis_pool, _redis_client
+    global _redis_pool, _redis_client, _redis_ready
 
+    _redis_ready = False
     if _redis_client:
         await _redis_client.aclose()
         _redis_client = None